@@ -2,13 +2,13 @@
 Management command to index all existing notes in vector database
 
 Usage:
-    python manage.py index_notes
+    python manage.py index_notes          # Index new notes and notes edited since their last embedding
     python manage.py index_notes --force  # Re-index all notes even if already indexed
 """
 
 from django.core.management.base import BaseCommand, CommandError
 from api.models import Entity, EntityType
-from api.services.vector_service import VectorService
+from api.services.vector_service import get_vector_service
 import logging
 
 logger = logging.getLogger(__name__)
@@ -32,7 +32,7 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         try:
-            vector_service = VectorService()
+            vector_service = get_vector_service()
             force_reindex = options['force']
             batch_size = options['batch_size']
             
@@ -43,52 +43,57 @@ class Command(BaseCommand):
                     self.style.WARNING('Force re-indexing all notes...')
                 )
             else:
-                notes_query = Entity.objects.filter(
-                    type=EntityType.NOTE,
-                    embedding__isnull=True
-                )
-                self.stdout.write('Indexing notes without embeddings...')
-            
-            total_notes = notes_query.count()
-            
-            if total_notes == 0:
-                self.stdout.write(
-                    self.style.SUCCESS('No notes need indexing.')
-                )
-                return
-            
-            self.stdout.write(f'Found {total_notes} notes to index.')
+                # New notes and notes edited since their last embedding are flagged;
+                # notes without text have their flag cleared and are not re-read
+                notes_query = Entity.objects.filter(needs_reembed=True, type=EntityType.NOTE)
+                self.stdout.write('Indexing notes without current embeddings...')
             
             # Process notes in batches
             indexed_count = 0
+            skipped_count = 0
             failed_count = 0
             
-            for i in range(0, total_notes, batch_size):
-                batch_notes = notes_query[i:i + batch_size]
+            # Keyset pagination on the primary key: each batch is an index range
+            # scan that starts after the previous one, with no OFFSET or COUNT.
+            # Only the embedded columns are read, as plain tuples rather than Entities.
+            notes_query = notes_query.order_by('id').values_list('id', 'title', 'content')
+            last_id = None
+            batch_number = 0
+            
+            while True:
+                page = notes_query.filter(id__gt=last_id) if last_id is not None else notes_query
+                batch_notes = list(page[:batch_size])
+                if not batch_notes:
+                    break
+                last_id = batch_notes[-1][0]
+                batch_number += 1
+                self.stdout.write(f'Processing batch {batch_number}...')
                 
-                self.stdout.write(f'Processing batch {i//batch_size + 1}...')
+                try:
+                    batch_indexed = len(vector_service.index_note_rows(batch_notes))
+                except Exception as e:
+                    failed_count += len(batch_notes)
+                    self.stdout.write(
+                        self.style.ERROR(f'  Error indexing batch {batch_number}: {e}')
+                    )
+                    continue
                 
-                for note in batch_notes:
-                    try:
-                        if vector_service.index_note(note):
-                            indexed_count += 1
-                            if indexed_count % 10 == 0:
-                                self.stdout.write(f'  Indexed {indexed_count}/{total_notes} notes...')
-                        else:
-                            failed_count += 1
-                            self.stdout.write(
-                                self.style.WARNING(f'  Failed to index note: {note.title} (ID: {note.id})')
-                            )
-                    except Exception as e:
-                        failed_count += 1
-                        self.stdout.write(
-                            self.style.ERROR(f'  Error indexing note {note.title}: {e}')
-                        )
+                indexed_count += batch_indexed
+                skipped_count += len(batch_notes) - batch_indexed
+                self.stdout.write(f'  Indexed {indexed_count} notes so far...')
+            
+            if batch_number == 0:
+                self.stdout.write(
+                    self.style.SUCCESS('No notes need indexing.')
+                )
+                return
             
             # Print summary
             self.stdout.write('\n' + '='*50)
             self.stdout.write(f'Indexing completed!')
             self.stdout.write(f'Successfully indexed: {indexed_count} notes')
+            if skipped_count > 0:
+                self.stdout.write(f'Skipped (no content): {skipped_count} notes')
             if failed_count > 0:
                 self.stdout.write(
                     self.style.WARNING(f'Failed to index: {failed_count} notes')
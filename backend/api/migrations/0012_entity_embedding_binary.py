@@ -0,0 +1,63 @@
+# Store entity embeddings as packed float32 bytes instead of JSON float lists
+
+from django.db import migrations, models
+import numpy as np
+
+
+BATCH_SIZE = 500
+
+
+def pack_embeddings(apps, schema_editor):
+    Entity = apps.get_model('api', 'Entity')
+    batch = []
+    for entity in Entity.objects.filter(embedding__isnull=False).only('id', 'embedding').iterator(chunk_size=BATCH_SIZE):
+        entity.embedding_vector = np.asarray(entity.embedding, dtype=np.float32).tobytes()
+        batch.append(entity)
+        if len(batch) >= BATCH_SIZE:
+            Entity.objects.bulk_update(batch, ['embedding_vector'])
+            batch = []
+    if batch:
+        Entity.objects.bulk_update(batch, ['embedding_vector'])
+
+
+def unpack_embeddings(apps, schema_editor):
+    Entity = apps.get_model('api', 'Entity')
+    batch = []
+    for entity in Entity.objects.filter(embedding_vector__isnull=False).only('id', 'embedding_vector').iterator(chunk_size=BATCH_SIZE):
+        entity.embedding = np.frombuffer(entity.embedding_vector, dtype=np.float32).tolist()
+        batch.append(entity)
+        if len(batch) >= BATCH_SIZE:
+            Entity.objects.bulk_update(batch, ['embedding'])
+            batch = []
+    if batch:
+        Entity.objects.bulk_update(batch, ['embedding'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_sync_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entity',
+            name='embedding_vector',
+            field=models.BinaryField(null=True, blank=True),
+        ),
+        migrations.RunPython(pack_embeddings, unpack_embeddings),
+        migrations.RemoveField(
+            model_name='entity',
+            name='embedding',
+        ),
+        migrations.RenameField(
+            model_name='entity',
+            old_name='embedding_vector',
+            new_name='embedding',
+        ),
+        migrations.AlterField(
+            model_name='entity',
+            name='embedding',
+            field=models.BinaryField(blank=True, help_text='Vector embedding for semantic search (packed float32)', null=True),
+        ),
+    ]
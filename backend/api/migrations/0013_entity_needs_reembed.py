@@ -0,0 +1,30 @@
+# Dirty flag for background re-embedding of notes
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def clear_fresh_embeddings(apps, schema_editor):
+    # Notes whose embedding is newer than their last edit do not need re-embedding
+    Entity = apps.get_model('api', 'Entity')
+    Entity.objects.filter(
+        embedding__isnull=False,
+        embedding_updated_at__isnull=False,
+        embedding_updated_at__gte=F('updated_at'),
+    ).update(needs_reembed=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_entity_embedding_binary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entity',
+            name='needs_reembed',
+            field=models.BooleanField(db_index=True, default=True, help_text='Embedding is missing or out of date'),
+        ),
+        migrations.RunPython(clear_fresh_embeddings, migrations.RunPython.noop),
+    ]
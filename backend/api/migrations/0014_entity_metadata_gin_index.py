@@ -0,0 +1,32 @@
+# GIN index on Entity.metadata for JSON containment / key-existence lookups.
+# PostgreSQL only: SQLite (dev/test) has no GIN indexes, so the operation is a no-op there.
+
+from django.db import migrations
+
+
+def create_metadata_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS api_entity_metadata_gin '
+        'ON api_entity USING gin (metadata)'
+    )
+
+
+def drop_metadata_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS api_entity_metadata_gin')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('api', '0013_entity_needs_reembed'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_metadata_gin_index, drop_metadata_gin_index),
+    ]
@@ -0,0 +1,17 @@
+# Partial index for notes that still need an embedding
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_entity_metadata_gin_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entity',
+            index=models.Index(condition=models.Q(('embedding__isnull', True)), fields=['type'], name='entity_unindexed_notes_idx'),
+        ),
+    ]
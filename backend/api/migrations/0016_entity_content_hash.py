@@ -0,0 +1,41 @@
+# Hash of the embedded title/content, so reverted edits do not trigger a re-embed
+
+import hashlib
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 500
+
+
+def backfill_content_hash(apps, schema_editor):
+    # Only embeddings known to be current can vouch for the text they were built from
+    Entity = apps.get_model('api', 'Entity')
+    batch = []
+    fresh = Entity.objects.filter(embedding__isnull=False, needs_reembed=False)
+    for entity in fresh.only('id', 'title', 'content').iterator(chunk_size=BATCH_SIZE):
+        entity.content_hash = hashlib.blake2b(
+            f"{entity.title}\0{entity.content}".encode(), digest_size=16
+        ).digest()
+        batch.append(entity)
+        if len(batch) >= BATCH_SIZE:
+            Entity.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    if batch:
+        Entity.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_entity_unindexed_notes_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entity',
+            name='content_hash',
+            field=models.BinaryField(blank=True, help_text='Hash of the title/content the embedding was computed from', max_length=16, null=True),
+        ),
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Rescale stored embeddings to unit length; similarity search is a plain dot product
+
+from django.db import migrations
+import numpy as np
+
+
+BATCH_SIZE = 500
+
+
+def normalize_embeddings(apps, schema_editor):
+    Entity = apps.get_model('api', 'Entity')
+    batch = []
+    for entity in Entity.objects.filter(embedding__isnull=False).only('id', 'embedding').iterator(chunk_size=BATCH_SIZE):
+        vector = np.frombuffer(entity.embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0 or abs(norm - 1) < 1e-6:
+            continue
+        entity.embedding = (vector / norm).astype(np.float32).tobytes()
+        batch.append(entity)
+        if len(batch) >= BATCH_SIZE:
+            Entity.objects.bulk_update(batch, ['embedding'])
+            batch = []
+    if batch:
+        Entity.objects.bulk_update(batch, ['embedding'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_entity_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_embeddings, migrations.RunPython.noop),
+    ]
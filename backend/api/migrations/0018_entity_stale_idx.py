@@ -0,0 +1,22 @@
+# Composite index for stale-embedding lookups; it replaces the single-column
+# updated_at index, which is a prefix of it
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_normalize_embeddings'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entity',
+            index=models.Index(fields=['updated_at', 'embedding_updated_at'], name='entity_stale_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='entity',
+            name='api_entity_updated_68438c_idx',
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Partial index for flagged notes instead of a full index on needs_reembed
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_entity_stale_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='entity',
+            name='needs_reembed',
+            field=models.BooleanField(default=True, help_text='Embedding is missing or out of date'),
+        ),
+        migrations.AddIndex(
+            model_name='entity',
+            index=models.Index(condition=models.Q(('needs_reembed', True), ('type', 'note')), fields=['type'], name='entity_reembed_notes_idx'),
+        ),
+    ]
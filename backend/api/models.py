@@ -1,5 +1,9 @@
+import hashlib
 import uuid
-from django.db import models
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Q
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
@@ -7,6 +11,31 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+
+def embedded_text_hash(title, content):
+    """16-byte digest of the title/content pair an embedding is computed from"""
+    return hashlib.blake2b(
+        f"{title}\0{content}".encode(), digest_size=16
+    ).digest()
+
+
+# Model the note embeddings are computed with (see services.vector_service), and
+# the length of its vectors; they are stored as packed float32
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDING_DIMENSION = 384
+
+
+def stored_embedding_is_current(title, content, content_hash, embedding_model, embedding):
+    """Whether a stored embedding is a well-formed vector of the current model for this text"""
+    return (
+        content_hash is not None
+        and embedding is not None
+        and embedding_model == EMBEDDING_MODEL_NAME
+        and len(embedding) == EMBEDDING_DIMENSION * 4
+        and bytes(content_hash) == embedded_text_hash(title, content)
+    )
+
+
 class EntityType(models.TextChoices):
     NOTE = "note", "Note"
     TEMPLATE = "template", "Template"
@@ -75,11 +104,13 @@ class Entity(models.Model):
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name="children", editable=True)
 
     # Vector fields for semantic search
-    embedding = models.JSONField(null=True, blank=True, help_text="Vector embedding for semantic search")
+    embedding = models.BinaryField(null=True, blank=True, help_text="Vector embedding for semantic search (packed float32)")
     embedding_model = models.CharField(max_length=100, null=True, blank=True, help_text="Model used for embedding")
     embedding_updated_at = models.DateTimeField(null=True, blank=True, help_text="When embedding was last updated")
+    needs_reembed = models.BooleanField(default=True, help_text="Embedding is missing or out of date")
+    content_hash = models.BinaryField(max_length=16, null=True, blank=True, help_text="Hash of the title/content the embedding was computed from")
 
-    # Metadata field for custom properties
+    # Metadata field for custom properties (GIN-indexed on PostgreSQL, see migration 0014)
     metadata = models.JSONField(default=dict, blank=True, help_text="Custom metadata and properties stored as JSON")
 
     # Tags relationship
@@ -89,15 +120,66 @@ class Entity(models.Model):
         indexes = [
             models.Index(fields=['type']),
             models.Index(fields=['parent']),
-            models.Index(fields=['updated_at']),
             models.Index(fields=['embedding_updated_at']),
             models.Index(fields=['server_updated_at']),
             models.Index(fields=['deleted']),
+            # Partial index for "notes still missing an embedding" lookups (index_notes);
+            # it only holds unindexed rows, so it shrinks to nothing once all are indexed
+            models.Index(fields=['type'], name='entity_unindexed_notes_idx', condition=Q(embedding__isnull=True)),
+            # Partial index for flagged notes (reembed_flagged_entities, index_notes); other
+            # entity types are never embedded, so their flag is left out of the index
+            models.Index(fields=['type'], name='entity_reembed_notes_idx', condition=Q(needs_reembed=True, type='note')),
+            # Stale-embedding lookups (update_stale_embeddings): recent edits newer than their embedding.
+            # Its updated_at prefix also serves plain updated_at filters and ordering
+            models.Index(fields=['updated_at', 'embedding_updated_at'], name='entity_stale_idx'),
         ]
 
     def __str__(self):
         return self.title
 
+    # Fields whose text is embedded; saves that leave them unchanged keep the embedding
+    EMBEDDED_TEXT_FIELDS = ('title', 'content')
+
+    @classmethod
+    def from_db(cls, db, field_names, values, **kwargs):
+        instance = super().from_db(db, field_names, values, **kwargs)
+        instance._stash_embedded_text()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # Deferred-field access refreshes only that field; other unsaved edits stay unsaved
+        self._stash_embedded_text(fields)
+
+    def _stash_embedded_text(self, fields=None):
+        # Only look at loaded values; touching a deferred field would issue a query
+        loaded = getattr(self, '_loaded_text', None) if fields is not None else None
+        if loaded is None:
+            loaded = self._loaded_text = {}
+        for name in self.EMBEDDED_TEXT_FIELDS:
+            if name in self.__dict__ and (fields is None or name in fields):
+                loaded[name] = self.__dict__[name]
+
+    def embedding_is_current(self):
+        """Whether the stored embedding was computed by the current model from the current title and content"""
+        # Unloaded (deferred) embedding columns count as not current rather than issuing queries
+        loaded = self.__dict__
+        return stored_embedding_is_current(
+            self.title, self.content,
+            loaded.get('content_hash'), loaded.get('embedding_model'), loaded.get('embedding')
+        )
+
+    def embedded_text_changed(self):
+        """Whether title or content differ from the values last loaded from the database"""
+        loaded = getattr(self, '_loaded_text', None)
+        if loaded is None:
+            return True
+        return any(
+            name not in loaded or loaded[name] != self.__dict__[name]
+            for name in self.EMBEDDED_TEXT_FIELDS
+            if name in self.__dict__
+        )
+
 
 class ThemeType(models.TextChoices):
     PREDEFINED = "predefined", "Predefined"
@@ -119,15 +201,63 @@ class Theme(models.Model):
         return f"{self.name} ({self.type})"
 
 
+# Fields written when an embedding is (re)generated; saves touching only these
+# must not mark the entity dirty again
+EMBEDDING_FIELDS = frozenset({'embedding', 'embedding_model', 'embedding_updated_at', 'needs_reembed', 'content_hash'})
+
+
 # Signal handlers for automatic vector indexing
-# NOTE: Automatic embedding generation is disabled for performance
-# Embeddings are now generated lazily on-demand (e.g., during semantic search)
+# NOTE: Embeddings are never generated inside the request/commit path.
+# Saves only flag the note; a Celery worker re-embeds flagged notes in batches.
 @receiver(post_save, sender=Entity)
-def update_embedding_on_save(sender, instance, created, **kwargs):
-    """Track notes that need embedding updates (lazy generation)"""
-    # Embedding generation moved to background tasks for better UX
-    # See: tasks.py for async embedding generation
-    pass
+def update_embedding_on_save(sender, instance, created, update_fields=None, **kwargs):
+    """Flag notes that need embedding updates and queue a background re-embed"""
+    if instance.type != EntityType.NOTE:
+        return
+    if update_fields and set(update_fields) <= EMBEDDING_FIELDS:
+        return
+    # Moves, metadata edits and sync bookkeeping do not change the embedded text
+    if not created and not instance.embedded_text_changed():
+        return
+    instance._stash_embedded_text()
+
+    # Text is back to what the stored embedding was built from (e.g. a reverted edit)
+    if instance.embedding_is_current():
+        if instance.needs_reembed:
+            Entity.objects.filter(pk=instance.pk).update(needs_reembed=False)
+            instance.needs_reembed = False
+        return
+
+    if not instance.needs_reembed:
+        Entity.objects.filter(pk=instance.pk).update(needs_reembed=True)
+        instance.needs_reembed = True
+
+    # Only enqueue when a broker is configured (dev/worker setups); otherwise the
+    # flag is picked up by the next reembed_flagged_entities or index_notes run
+    if getattr(settings, 'CELERY_BROKER_URL', None):
+        _schedule_reembed()
+
+
+REEMBED_QUEUED_CACHE_KEY = 'api:reembed_flagged_entities:queued'
+REEMBED_QUEUED_TIMEOUT = 600  # seconds; re-queue even if a queued task was lost
+
+
+def _enqueue_reembed():
+    """Queue reembed_flagged_entities unless one is already waiting to run"""
+    from .tasks import reembed_flagged_entities
+    # cache.add is atomic, so only the first commit queues a task; the task clears the key when it starts
+    if not cache.add(REEMBED_QUEUED_CACHE_KEY, True, REEMBED_QUEUED_TIMEOUT):
+        return
+    try:
+        reembed_flagged_entities.delay()
+    except Exception:
+        cache.delete(REEMBED_QUEUED_CACHE_KEY)
+        raise
+
+
+def _schedule_reembed():
+    # robust: the note is already committed, so a broker outage is logged rather than raised from save()
+    transaction.on_commit(_enqueue_reembed, robust=True)
 
 
 @receiver(post_delete, sender=Entity)
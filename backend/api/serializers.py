@@ -1,8 +1,21 @@
+import copy
 from rest_framework import serializers
 from .models import Entity, Theme, Tag, EntityTag
 
 
-class TagSerializer(serializers.ModelSerializer):
+class CachedFieldsModelSerializer(serializers.ModelSerializer):
+    """ModelSerializer that builds its fields from Meta once per class"""
+
+    def get_fields(self):
+        # Building fields from Meta introspects the model on every instance; do it
+        # once per class and give each instance its own copy to bind
+        cls = type(self)
+        if '_cached_fields' not in cls.__dict__:
+            cls._cached_fields = super().get_fields()
+        return copy.deepcopy(cls._cached_fields)
+
+
+class TagSerializer(CachedFieldsModelSerializer):
     children_count = serializers.SerializerMethodField()
     entities_count = serializers.SerializerMethodField()
 
@@ -10,14 +23,17 @@ class TagSerializer(serializers.ModelSerializer):
         model = Tag
         fields = ["id", "name", "color", "description", "parent", "children_count", "entities_count", "created_at", "updated_at"]
 
+    # Querysets from TagViewSet annotate both counts; other callers fall back to COUNT queries
     def get_children_count(self, obj):
-        return obj.children.count()
+        count = getattr(obj, 'children_count', None)
+        return obj.children.count() if count is None else count
 
     def get_entities_count(self, obj):
-        return obj.entities.count()
+        count = getattr(obj, 'entities_count', None)
+        return obj.entities.count() if count is None else count
 
 
-class EntityTagSerializer(serializers.ModelSerializer):
+class EntityTagSerializer(CachedFieldsModelSerializer):
     tag = TagSerializer(read_only=True)
 
     class Meta:
@@ -25,7 +41,7 @@ class EntityTagSerializer(serializers.ModelSerializer):
         fields = ["tag", "created_at"]
 
 
-class EntitySerializer(serializers.ModelSerializer):
+class EntitySerializer(CachedFieldsModelSerializer):
     # Return tag IDs instead of full Tag objects
     tags = serializers.SerializerMethodField()
     tag_ids = serializers.ListField(child=serializers.UUIDField(), write_only=True, required=False)
@@ -51,7 +67,45 @@ class EntitySerializer(serializers.ModelSerializer):
         return instance
 
 
-class ThemeSerializer(serializers.ModelSerializer):
+class EntityListSerializer(serializers.BaseSerializer):
+    """
+    Read-only serializer for entity list responses.
+
+    Produces the same output as EntitySerializer(many=True), but reads plain
+    .values() rows and two relation lookups instead of building model
+    instances and binding fields for every entity.
+    """
+    datetime_field = serializers.DateTimeField()
+
+    def to_representation(self, queryset):
+        entity_ids = queryset.values('pk')
+
+        children = {}
+        for parent_id, child_id in Entity.objects.filter(parent__in=entity_ids).values_list('parent_id', 'id'):
+            children.setdefault(parent_id, []).append(child_id)
+
+        tags = {}
+        for entity_id, tag_id in EntityTag.objects.filter(entity__in=entity_ids).values_list('entity_id', 'tag_id'):
+            tags.setdefault(entity_id, []).append(str(tag_id))
+
+        to_datetime = self.datetime_field.to_representation
+        return [
+            {
+                "id": str(row["id"]),
+                "type": row["type"],
+                "title": row["title"],
+                "content": row["content"],
+                "created_at": to_datetime(row["created_at"]),
+                "parent": row["parent"],
+                "children": children.get(row["id"], []),
+                "tags": tags.get(row["id"], []),
+                "metadata": row["metadata"],
+            }
+            for row in queryset.values("id", "type", "title", "content", "created_at", "parent", "metadata")
+        ]
+
+
+class ThemeSerializer(CachedFieldsModelSerializer):
     class Meta:
         model = Theme
         fields = ["id", "name", "type", "colors", "created_at", "updated_at"]
@@ -80,7 +134,7 @@ class ThemeSerializer(serializers.ModelSerializer):
 
 
 
-class SyncTagSerializer(serializers.ModelSerializer):
+class SyncTagSerializer(CachedFieldsModelSerializer):
     class Meta:
         model = Tag
         fields = [
@@ -89,7 +143,7 @@ class SyncTagSerializer(serializers.ModelSerializer):
         ]
 
 
-class SyncEntitySerializer(serializers.ModelSerializer):
+class SyncEntitySerializer(CachedFieldsModelSerializer):
     tags = serializers.SerializerMethodField()
     parent = serializers.SerializerMethodField()
 
@@ -105,4 +159,5 @@ class SyncEntitySerializer(serializers.ModelSerializer):
         return [str(tag.id) for tag in obj.tags.all()]
 
     def get_parent(self, obj):
-        return str(obj.parent.id) if obj.parent else None
+        # parent_id avoids loading the parent row for every entity
+        return str(obj.parent_id) if obj.parent_id else None
@@ -5,27 +5,100 @@ Handles vector embeddings for notes using sentence transformers.
 Works with both SQLite (development) and PostgreSQL (production).
 """
 
+from django.core.cache import cache
 from django.db import connection
+from django.db.models import Count, Max
 from django.conf import settings
 from django.utils import timezone
 import numpy as np
 from sentence_transformers import SentenceTransformer
+from ..models import EMBEDDING_MODEL_NAME, Entity, EntityType, embedded_text_hash
 from typing import List, Tuple, Optional
+import functools
+import hashlib
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Embeddings are stored as raw float32 bytes, so reads skip JSON parsing
+EMBEDDING_DTYPE = np.float32
+
+# Texts per forward pass when encoding in bulk
+ENCODE_BATCH_SIZE = 64
+
+# Seconds an encoded text stays in the Django cache (Redis when configured)
+EMBEDDING_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def encode_embedding(vector) -> bytes:
+    """Pack an embedding vector into the bytes stored in Entity.embedding"""
+    return np.asarray(vector, dtype=EMBEDDING_DTYPE).tobytes()
+
+
+def decode_embedding(data) -> np.ndarray:
+    """Unpack Entity.embedding bytes into a read-only float32 vector"""
+    return np.frombuffer(data, dtype=EMBEDDING_DTYPE)
+
+
+def embedding_text(title, content) -> str:
+    """Text a note's embedding is computed from; empty when there is nothing to embed"""
+    return f"{title}\n{content}".strip()
+
+
+def reflag_edited_notes(rows) -> list:
+    """
+    Flag notes for re-embedding again if their text changed after rows were read
+    
+    Embedding writes clear needs_reembed for text read earlier; an edit committed
+    in between would otherwise keep the old embedding until its next save.
+    
+    Args:
+        rows: (id, title, content) tuples the embeddings were computed from
+        
+    Returns:
+        IDs of the notes that were flagged again
+    """
+    read = {str(note_id): (title, content) for note_id, title, content in rows}
+    if not read:
+        return []
+    
+    edited = [
+        note_id
+        for note_id, title, content in Entity.objects.filter(pk__in=read).values_list('id', 'title', 'content')
+        if read[str(note_id)] != (title, content)
+    ]
+    if edited:
+        Entity.objects.filter(pk__in=edited).update(needs_reembed=True)
+        logger.info(f"Flagged {len(edited)} notes edited during embedding for re-embedding")
+    return edited
+
+
+def _embedding_cache_key(text: str) -> str:
+    """Cache key for the embedding of text under the current model"""
+    digest = hashlib.sha256(f"{EMBEDDING_MODEL_NAME}\0{text}".encode()).hexdigest()
+    return f"embedding:{digest}"
+
+
+@functools.lru_cache(maxsize=1)
+def _load_model() -> SentenceTransformer:
+    """Load the embedding model once per process, shared by every VectorService"""
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    model.eval()
+    return model
+
 
 class VectorService:
     """Service for handling vector embeddings and semantic search"""
     
     def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.model = _load_model()
         self.is_postgresql = 'postgresql' in settings.DATABASES['default']['ENGINE']
+        # Cached (signature, ids, row lookup, normalized matrix) of all note embeddings
+        self._index = None
         logger.info(f"VectorService initialized with {'PostgreSQL' if self.is_postgresql else 'SQLite'}")
     
-    def generate_embedding(self, text: str) -> List[float]:
+    def generate_embedding(self, text: str) -> np.ndarray:
         """
         Generate embedding vector for text
         
@@ -33,15 +106,57 @@ class VectorService:
             text: Text to embed
             
         Returns:
-            List of floats representing the embedding vector
+            Unit-length float32 numpy array representing the embedding vector
         """
         try:
-            embedding = self.model.encode(text)
-            return embedding.tolist()
+            return self.generate_embeddings([text])[0]
         except Exception as e:
             logger.error(f"Failed to generate embedding: {e}")
             raise
     
+    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embedding vectors for several texts in one model call
+        
+        Texts already encoded recently are served from the cache; only the
+        remaining distinct texts go through the model.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            float32 numpy array of shape (len(texts), dimension) with unit-length rows
+        """
+        keys = [_embedding_cache_key(text) for text in texts]
+        try:
+            cached = cache.get_many(keys)
+        except Exception as e:
+            logger.warning("Embedding cache lookup failed: %s", e)
+            cached = {}
+        
+        vectors = {key: decode_embedding(data) for key, data in cached.items()}
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        
+        if missing:
+            embeddings = self.model.encode(
+                list(missing.values()),
+                batch_size=ENCODE_BATCH_SIZE,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            ).astype(EMBEDDING_DTYPE, copy=False)
+            encoded = dict(zip(missing, embeddings))
+            vectors.update(encoded)
+            try:
+                cache.set_many(
+                    {key: embedding.tobytes() for key, embedding in encoded.items()},
+                    timeout=EMBEDDING_CACHE_TIMEOUT
+                )
+            except Exception as e:
+                logger.warning("Embedding cache update failed: %s", e)
+        
+        return np.stack([vectors[key] for key in keys])
+    
     def index_note(self, note) -> bool:
         """
         Generate and store embedding for a note
@@ -53,36 +168,74 @@ class VectorService:
             True if successful, False otherwise
         """
         try:
-            # Import here to avoid circular imports
-            from ..models import Entity, EntityType
-            
             if note.type != EntityType.NOTE:
                 return False
-                
-            # Create content for embedding (title + content)
-            content_for_embedding = f"{note.title}\n{note.content}".strip()
             
-            if not content_for_embedding:
-                logger.warning(f"Note {note.id} has no content to embed")
-                return False
-            
-            # Generate embedding
-            embedding = self.generate_embedding(content_for_embedding)
-            
-            # Update note with embedding
-            Entity.objects.filter(id=note.id).update(
-                embedding=embedding,
-                embedding_model="all-MiniLM-L6-v2",
-                embedding_updated_at=timezone.now()
-            )
-            
-            logger.info(f"Successfully indexed note {note.id}")
-            return True
+            # Same write path as bulk indexing, with a batch of one
+            return bool(self.index_note_rows([(note.id, note.title, note.content)]))
             
         except Exception as e:
             logger.error(f"Failed to index note {note.id}: {e}")
             return False
     
+    def index_note_rows(self, rows) -> list:
+        """
+        Generate and store embeddings for notes given as plain rows
+        
+        Args:
+            rows: Iterable of (id, title, content) tuples, e.g. from values_list()
+            
+        Returns:
+            IDs of the notes that were indexed (rows without text are skipped and
+            their needs_reembed flag cleared, so they are not picked up again)
+        """
+        to_index = []
+        texts = []
+        empty_rows = []
+        for note_id, title, content in rows:
+            content_for_embedding = embedding_text(title, content)
+            if not content_for_embedding:
+                logger.warning(f"Note {note_id} has no content to embed")
+                empty_rows.append((note_id, title, content))
+                continue
+            to_index.append((note_id, title, content))
+            texts.append(content_for_embedding)
+        
+        if empty_rows:
+            Entity.objects.filter(pk__in=[row[0] for row in empty_rows]).update(needs_reembed=False)
+            reflag_edited_notes(empty_rows)
+        
+        if not to_index:
+            return []
+        
+        # Batched forward passes over all texts instead of one per note
+        embeddings = self.generate_embeddings(texts)
+        
+        # bulk_update only needs the pk and the written fields, so the rows never
+        # have to be loaded as full Entity instances
+        now = timezone.now()
+        updates = [
+            Entity(
+                id=note_id,
+                embedding=encode_embedding(embedding),
+                embedding_model=EMBEDDING_MODEL_NAME,
+                embedding_updated_at=now,
+                needs_reembed=False,
+                content_hash=embedded_text_hash(title, content),
+            )
+            for (note_id, title, content), embedding in zip(to_index, embeddings)
+        ]
+        Entity.objects.bulk_update(
+            updates,
+            ['embedding', 'embedding_model', 'embedding_updated_at', 'needs_reembed', 'content_hash'],
+            batch_size=500
+        )
+        reflag_edited_notes(to_index)
+        
+        self._index = None
+        logger.info(f"Successfully indexed {len(updates)} notes")
+        return [note.id for note in updates]
+    
     def remove_note(self, note_id: str) -> bool:
         """
         Remove note embedding from index
@@ -94,13 +247,13 @@ class VectorService:
             True if successful, False otherwise
         """
         try:
-            from ..models import Entity
-            
             Entity.objects.filter(id=note_id).update(
                 embedding=None,
                 embedding_model=None,
-                embedding_updated_at=None
+                embedding_updated_at=None,
+                content_hash=None
             )
+            self._index = None
             
             logger.info(f"Successfully removed note {note_id} from index")
             return True
@@ -124,70 +277,91 @@ class VectorService:
         """
         try:
             query_embedding = self.generate_embedding(query_text)
-            exclude_ids = exclude_ids or []
-            
-            if self.is_postgresql:
-                return self._find_similar_postgresql(query_embedding, limit, threshold, exclude_ids)
-            else:
-                return self._find_similar_sqlite(query_embedding, limit, threshold, exclude_ids)
+            return self._find_similar(query_embedding, limit, threshold, exclude_ids or [])
                 
         except Exception as e:
             logger.error(f"Failed to find similar notes: {e}")
             return []
     
-    def _find_similar_postgresql(self, query_embedding: List[float], limit: int, threshold: float, exclude_ids: List[str]):
+    def _find_similar(self, query_embedding: np.ndarray, limit: int, threshold: float, exclude_ids: List[str]):
+        """Search with an already computed query embedding using the method for the current database"""
+        if self.is_postgresql:
+            return self._find_similar_postgresql(query_embedding, limit, threshold, exclude_ids)
+        else:
+            return self._find_similar_sqlite(query_embedding, limit, threshold, exclude_ids)
+    
+    def _find_similar_postgresql(self, query_embedding: np.ndarray, limit: int, threshold: float, exclude_ids: List[str]):
         """Use pgvector for PostgreSQL (future implementation)"""
         # For now, fall back to SQLite method
         # TODO: Implement pgvector when available in production
         return self._find_similar_sqlite(query_embedding, limit, threshold, exclude_ids)
     
-    def _find_similar_sqlite(self, query_embedding: List[float], limit: int, threshold: float, exclude_ids: List[str]):
-        """Use cosine similarity for SQLite"""
-        from ..models import Entity, EntityType
+    def _embedding_index(self, dimension: int):
+        """
+        Return the cached matrix of (unit-length) note embeddings
+        
+        The matrix is rebuilt only when the set of embeddings changes, which is
+        detected with one aggregate query (embeddings are also written by Celery
+        workers, so local invalidation alone is not enough).
         
-        # Get all notes with embeddings
+        Returns:
+            Tuple of (ids, row index by id string, float32 matrix of shape (N, dimension))
+        """
         notes_query = Entity.objects.filter(
             type=EntityType.NOTE,
             embedding__isnull=False
         )
+        stats = notes_query.aggregate(count=Count('id'), latest=Max('embedding_updated_at'))
+        signature = (stats['count'], stats['latest'], dimension)
         
-        if exclude_ids:
-            notes_query = notes_query.exclude(id__in=exclude_ids)
+        index = self._index
+        if index is not None and index[0] == signature:
+            return index[1:]
         
-        notes_with_embeddings = notes_query.all()
+        row_size = np.dtype(EMBEDDING_DTYPE).itemsize * dimension
+        ids = []
+        blobs = []
+        for note_id, embedding in notes_query.values_list('id', 'embedding'):
+            if len(embedding) != row_size:
+                logger.warning(f"Skipping note {note_id}: embedding size does not match the model")
+                continue
+            ids.append(note_id)
+            blobs.append(embedding)
         
-        similarities = []
-        for note in notes_with_embeddings:
-            if note.embedding:
-                try:
-                    similarity = self._cosine_similarity(query_embedding, note.embedding)
-                    if similarity >= threshold:
-                        similarities.append((note, similarity))
-                except Exception as e:
-                    logger.warning(f"Failed to calculate similarity for note {note.id}: {e}")
-                    continue
+        # Stored embeddings are unit length (normalized when generated, see migration 0017),
+        # so the raw bytes are used as-is and a search is a single matrix-vector product
+        matrix = np.frombuffer(b''.join(blobs), dtype=EMBEDDING_DTYPE).reshape(len(ids), dimension)
         
-        # Sort by similarity and return top results
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return [note for note, _ in similarities[:limit]]
+        rows = {str(note_id): i for i, note_id in enumerate(ids)}
+        # Swapped in as one tuple so concurrent searches never see a partial rebuild
+        self._index = (signature, ids, rows, matrix)
+        return ids, rows, matrix
     
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """Calculate cosine similarity between two vectors"""
-        try:
-            vec1_np = np.array(vec1)
-            vec2_np = np.array(vec2)
-            
-            # Handle zero vectors
-            norm1 = np.linalg.norm(vec1_np)
-            norm2 = np.linalg.norm(vec2_np)
-            
-            if norm1 == 0 or norm2 == 0:
-                return 0.0
-            
-            return np.dot(vec1_np, vec2_np) / (norm1 * norm2)
-        except Exception as e:
-            logger.error(f"Failed to calculate cosine similarity: {e}")
-            return 0.0
+    def _find_similar_sqlite(self, query_embedding: np.ndarray, limit: int, threshold: float, exclude_ids: List[str]):
+        """Use cosine similarity computed with one matrix product over the cached embeddings"""
+        query = np.asarray(query_embedding, dtype=EMBEDDING_DTYPE)
+        ids, rows, matrix = self._embedding_index(query.shape[0])
+        
+        if not ids:
+            return []
+        
+        # Query and stored embeddings are unit length, so the dot product is the cosine similarity
+        similarities = matrix @ query
+        
+        for note_id in exclude_ids:
+            row = rows.get(str(note_id))
+            if row is not None:
+                similarities[row] = -np.inf
+        
+        candidates = np.flatnonzero(similarities >= threshold)
+        # Partial selection of the best `limit` candidates, then sort only those
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-similarities[candidates], limit - 1)[:limit]]
+        top = candidates[np.argsort(-similarities[candidates], kind='stable')]
+        top_ids = [ids[i] for i in top]
+        
+        notes = Entity.objects.in_bulk(top_ids)
+        return [notes[note_id] for note_id in top_ids if note_id in notes]
     
     def find_relevant_context(self, conversation_history: List[str], current_note_id: Optional[str] = None, max_notes: int = 10):
         """
@@ -202,77 +376,64 @@ class VectorService:
             List of Entity objects representing relevant context
         """
         try:
-            logger.info("=== VECTOR SERVICE FIND_RELEVANT_CONTEXT ===")
-            logger.info(f"Conversation history: {conversation_history}")
-            logger.info(f"Current note ID: {current_note_id}")
-            logger.info(f"Max notes: {max_notes}")
+            # Conversation dumps can be large; only format them when DEBUG is enabled
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Finding relevant context: history=%r, current_note_id=%s, max_notes=%s",
+                    conversation_history, current_note_id, max_notes
+                )
 
             # Combine recent conversation messages for context
             conversation_text = " ".join(conversation_history[-3:]) if conversation_history else ""
-            logger.info(f"Combined conversation text: {conversation_text}")
 
             if not conversation_text and not current_note_id:
-                logger.info("No conversation text or current note ID - returning empty context")
+                logger.debug("No conversation text or current note ID - returning empty context")
                 return []
 
             exclude_ids = [current_note_id] if current_note_id else []
-            logger.info(f"Excluding note IDs: {exclude_ids}")
 
-            # Find semantically similar notes
+            # Texts to search with: the conversation, then the current note's content
+            queries = []
             if conversation_text:
-                logger.info(f"Searching for similar notes with query: '{conversation_text}'")
-                similar_notes = self.find_similar_notes(
-                    query_text=conversation_text,
-                    limit=max_notes,
-                    threshold=0.3,  # Temporarily lowered for debugging
-                    exclude_ids=exclude_ids
-                )
-                logger.info(f"Found {len(similar_notes)} similar notes from conversation")
-            else:
-                logger.info("No conversation text - skipping similarity search")
-                similar_notes = []
-            
-            # If we have a current note, also find notes similar to it
-            if current_note_id and len(similar_notes) < max_notes:
-                logger.info(f"Looking for notes similar to current note: {current_note_id}")
-                from ..models import Entity
+                queries.append(conversation_text)
+            if current_note_id:
                 try:
-                    current_note = Entity.objects.get(id=current_note_id)
+                    current_note = Entity.objects.only('title', 'content').get(id=current_note_id)
                     if current_note.content:
-                        logger.info(f"Finding notes similar to current note content: {current_note.title}")
-                        content_similar = self.find_similar_notes(
-                            query_text=f"{current_note.title}\n{current_note.content}",
-                            limit=max_notes - len(similar_notes),
-                            threshold=0.3,  # Temporarily lowered for debugging
-                            exclude_ids=exclude_ids + [note.id for note in similar_notes]
-                        )
-                        logger.info(f"Found {len(content_similar)} notes similar to current note")
-                        similar_notes.extend(content_similar)
+                        queries.append(f"{current_note.title}\n{current_note.content}")
                     else:
-                        logger.info("Current note has no content to search with")
+                        logger.debug("Current note %s has no content to search with", current_note_id)
                 except Entity.DoesNotExist:
-                    logger.warning(f"Current note not found: {current_note_id}")
+                    logger.warning("Current note not found: %s", current_note_id)
 
-            final_notes = similar_notes[:max_notes]
-            logger.info(f"Returning {len(final_notes)} total context notes:")
-            for i, note in enumerate(final_notes):
-                logger.info(f"  {i+1}. {note.title} (ID: {note.id})")
+            if not queries:
+                return []
+
+            # Encode every query in one model call, then fill the result in query order
+            similar_notes = []
+            for query_embedding in self.generate_embeddings(queries):
+                if len(similar_notes) >= max_notes:
+                    break
+                found = self._find_similar(
+                    query_embedding,
+                    limit=max_notes - len(similar_notes),
+                    threshold=0.3,  # Temporarily lowered for debugging
+                    exclude_ids=exclude_ids + [note.id for note in similar_notes]
+                )
+                logger.debug("Found %d similar notes", len(found))
+                similar_notes.extend(found)
 
-            logger.info("=== VECTOR SERVICE CONTEXT COMPLETE ===")
+            final_notes = similar_notes[:max_notes]
+            logger.debug("Returning %d context notes", len(final_notes))
             return final_notes
             
         except Exception as e:
-            logger.error(f"Failed to find relevant context: {e}")
-            logger.error("=== VECTOR SERVICE CONTEXT ERROR ===")
-            import traceback
-            logger.error(f"Full traceback: {traceback.format_exc()}")
+            logger.exception("Failed to find relevant context: %s", e)
             return []
     
     def get_stats(self) -> dict:
         """Get statistics about the vector index"""
         try:
-            from ..models import Entity, EntityType
-            
             total_notes = Entity.objects.filter(type=EntityType.NOTE).count()
             indexed_notes = Entity.objects.filter(
                 type=EntityType.NOTE,
@@ -284,8 +445,19 @@ class VectorService:
                 'indexed_notes': indexed_notes,
                 'index_coverage': indexed_notes / total_notes if total_notes > 0 else 0,
                 'database_type': 'PostgreSQL' if self.is_postgresql else 'SQLite',
-                'embedding_model': 'all-MiniLM-L6-v2'
+                'embedding_model': EMBEDDING_MODEL_NAME
             }
         except Exception as e:
             logger.error(f"Failed to get vector stats: {e}")
             return {}
+
+
+@functools.lru_cache(maxsize=None)
+def get_vector_service() -> VectorService:
+    """
+    Return the process-wide VectorService, creating it on first use
+
+    Loading the sentence transformer is expensive, so request handlers share
+    one instance instead of building a new service per call.
+    """
+    return VectorService()
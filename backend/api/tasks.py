@@ -8,31 +8,41 @@ This module contains async tasks for:
 
 from celery import shared_task
 from django.utils import timezone
+from itertools import islice
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
+# Entities per generate_embeddings_batch task when fanning out large jobs
+EMBEDDING_BATCH_SIZE = 100
 
-@shared_task(bind=True, name='api.tasks.generate_embedding_for_entity')
-def generate_embedding_for_entity(self, entity_id: str):
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True, name='api.tasks.generate_embedding_for_entity')
+def generate_embedding_for_entity(self, entity_id: str, force: bool = False):
     """
     Generate embedding for a single entity.
     
     Args:
         entity_id: The ID of the entity to generate embedding for
+        force: Re-encode even if the stored embedding is current
         
     Returns:
         dict: Status information about the task
     """
-    from api.models import Entity
-    from api.services.vector_service import VectorService
+    from api.models import Entity, embedded_text_hash
+    from api.services.vector_service import (
+        EMBEDDING_MODEL_NAME, embedding_text, encode_embedding, get_vector_service, reflag_edited_notes
+    )
     
     try:
         logger.info(f"Starting embedding generation for entity {entity_id}")
         
-        # Get the entity
+        # Get the entity (only the columns the embedding depends on)
         try:
-            entity = Entity.objects.get(id=entity_id)
+            entity = Entity.objects.only(
+                'id', 'title', 'content', 'content_hash', 'embedding_model', 'embedding'
+            ).get(id=entity_id)
         except Entity.DoesNotExist:
             logger.error(f"Entity {entity_id} not found")
             return {
@@ -41,27 +51,50 @@ def generate_embedding_for_entity(self, entity_id: str):
                 'error': 'Entity not found'
             }
         
-        # Generate embedding
-        vector_service = VectorService()
+        # The stored embedding was built by the current model from this exact text; skip the model call
+        if not force and entity.embedding_is_current():
+            now = timezone.now()
+            Entity.objects.filter(id=entity_id).update(embedding_updated_at=now, needs_reembed=False)
+            reflag_edited_notes([(entity.id, entity.title, entity.content)])
+            logger.info(f"Embedding for entity {entity_id} is current, skipping")
+            return {
+                'status': 'skipped',
+                'entity_id': entity_id,
+                'reason': 'Content unchanged',
+                'updated_at': now.isoformat()
+            }
         
-        # Combine title and content for embedding
-        text_to_embed = f"{entity.title}\n\n{entity.content}"
+        # Same text as the bulk indexing paths, so both share cached embeddings
+        text_to_embed = embedding_text(entity.title, entity.content)
+        if not text_to_embed:
+            logger.warning(f"Entity {entity_id} has no content to embed")
+            return {
+                'status': 'error',
+                'entity_id': entity_id,
+                'error': 'No content to embed'
+            }
         
         # Generate the embedding
-        embedding = vector_service.generate_embedding(text_to_embed)
+        embedding = get_vector_service().generate_embedding(text_to_embed)
         
-        # Store the embedding in the entity
-        entity.embedding = embedding
-        entity.embedding_updated_at = timezone.now()
-        entity.save(update_fields=['embedding', 'embedding_updated_at'])
+        # Store the embedding with one targeted UPDATE (no instance save or signals)
+        now = timezone.now()
+        Entity.objects.filter(id=entity_id).update(
+            embedding=encode_embedding(embedding),
+            embedding_model=EMBEDDING_MODEL_NAME,
+            embedding_updated_at=now,
+            needs_reembed=False,
+            content_hash=embedded_text_hash(entity.title, entity.content)
+        )
+        reflag_edited_notes([(entity.id, entity.title, entity.content)])
         
         logger.info(f"Successfully generated embedding for entity {entity_id}")
         
         return {
             'status': 'success',
             'entity_id': entity_id,
-            'embedding_dimension': len(embedding) if embedding else 0,
-            'updated_at': entity.embedding_updated_at.isoformat()
+            'embedding_dimension': len(embedding),
+            'updated_at': now.isoformat()
         }
         
     except Exception as e:
@@ -73,45 +106,141 @@ def generate_embedding_for_entity(self, entity_id: str):
         }
 
 
-@shared_task(bind=True, name='api.tasks.generate_embeddings_batch')
-def generate_embeddings_batch(self, entity_ids: list[str]):
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True, name='api.tasks.generate_embeddings_batch')
+def generate_embeddings_batch(self, entity_ids: list[str], force: bool = False):
     """
     Generate embeddings for multiple entities in batch.
     
     Args:
         entity_ids: List of entity IDs to generate embeddings for
+        force: Re-encode entities even if their stored embedding is current
         
     Returns:
         dict: Summary of batch processing results
     """
+    from api.models import Entity, stored_embedding_is_current
+    from api.services.vector_service import get_vector_service, reflag_edited_notes
+    
     logger.info(f"Starting batch embedding generation for {len(entity_ids)} entities")
     
     results = {
         'total': len(entity_ids),
         'success': 0,
+        'skipped': 0,
         'failed': 0,
         'errors': []
     }
     
-    for entity_id in entity_ids:
+    # Malformed IDs cannot match an entity; keep them out of the query so they
+    # are reported per entity instead of failing the whole batch
+    requested = [(entity_id, _parse_uuid(entity_id)) for entity_id in entity_ids]
+    lookup_ids = [entity_uuid for _, entity_uuid in requested if entity_uuid is not None]
+    
+    # One query for all rows, one batched model call and one bulk write
+    rows = []
+    unchanged_rows = []
+    unchanged_ids = set()
+    found_ids = set()
+    for entity_id, title, content, content_hash, embedding_model, embedding in Entity.objects.filter(
+        id__in=lookup_ids
+    ).values_list('id', 'title', 'content', 'content_hash', 'embedding_model', 'embedding'):
+        found_ids.add(str(entity_id))
+        # The stored embedding was built by the current model from this exact text; skip the model call
+        if not force and stored_embedding_is_current(title, content, content_hash, embedding_model, embedding):
+            unchanged_ids.add(str(entity_id))
+            unchanged_rows.append((entity_id, title, content))
+        else:
+            rows.append((entity_id, title, content))
+    
+    if unchanged_ids:
+        # Mark them fresh so stale-embedding checks stop selecting them
+        Entity.objects.filter(id__in=unchanged_ids).update(
+            embedding_updated_at=timezone.now(), needs_reembed=False
+        )
+        reflag_edited_notes(unchanged_rows)
+    
+    try:
+        indexed_ids = {str(entity_id) for entity_id in get_vector_service().index_note_rows(rows)}
+    except Exception as e:
+        logger.error(f"Failed to generate batch embeddings: {str(e)}")
+        indexed_ids = set()
+        error = str(e)
+    else:
+        error = 'No content to embed'
+    
+    for entity_id, entity_uuid in requested:
+        key = str(entity_uuid)
+        if key in indexed_ids:
+            results['success'] += 1
+            continue
+        if key in unchanged_ids:
+            results['skipped'] += 1
+            continue
+        results['failed'] += 1
+        results['errors'].append({
+            'entity_id': str(entity_id),
+            'error': error if key in found_ids else 'Entity not found'
+        })
+    
+    logger.info(
+        f"Batch embedding generation complete: {results['success']} success, "
+        f"{results['skipped']} unchanged, {results['failed']} failed"
+    )
+    
+    return results
+
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True, name='api.tasks.reembed_flagged_entities')
+def reembed_flagged_entities(self, batch_size: int = 50):
+    """
+    Re-embed notes flagged with needs_reembed.
+    
+    Queued after commit by the Entity post_save handler; flagged notes are
+    encoded batch_size at a time with one model call per batch.
+    
+    Args:
+        batch_size: Number of notes to encode per model call
+        
+    Returns:
+        dict: Summary of processing results
+    """
+    from django.core.cache import cache
+    from api.models import Entity, EntityType, REEMBED_QUEUED_CACHE_KEY
+    from api.services.vector_service import get_vector_service
+    
+    # Let saves committed from here on queue a follow-up run
+    cache.delete(REEMBED_QUEUED_CACHE_KEY)
+    
+    flagged = Entity.objects.filter(type=EntityType.NOTE, needs_reembed=True)
+    
+    results = {
+        'total': 0,
+        'success': 0,
+        'skipped': 0,
+    }
+    
+    vector_service = None
+    while True:
+        batch = list(flagged.values_list('id', 'title', 'content')[:batch_size])
+        if not batch:
+            break
+        
+        if vector_service is None:
+            vector_service = get_vector_service()
+        
         try:
-            result = generate_embedding_for_entity(entity_id)
-            if result['status'] == 'success':
-                results['success'] += 1
-            else:
-                results['failed'] += 1
-                results['errors'].append({
-                    'entity_id': entity_id,
-                    'error': result.get('error', 'Unknown error')
-                })
+            indexed_ids = vector_service.index_note_rows(batch)
         except Exception as e:
-            results['failed'] += 1
-            results['errors'].append({
-                'entity_id': entity_id,
-                'error': str(e)
-            })
+            logger.error(f"Failed to re-embed flagged notes: {str(e)}")
+            results['error'] = str(e)
+            break
+        
+        # Notes without text are skipped by the encoder, which also clears their flag
+        results['total'] += len(batch)
+        results['success'] += len(indexed_ids)
+        results['skipped'] += len(batch) - len(indexed_ids)
     
-    logger.info(f"Batch embedding generation complete: {results['success']} success, {results['failed']} failed")
+    logger.info(f"Re-embedded flagged notes: {results['success']} success, {results['skipped']} skipped")
     
     return results
 
@@ -126,22 +255,21 @@ def regenerate_all_embeddings(self):
     - Model upgrades
     - Fixing corrupted embeddings
     
+    Every entity is re-encoded, including those whose embedding looks current.
+    
     Returns:
-        dict: Summary of regeneration results
+        dict: Summary of the queued embedding batches
     """
     from api.models import Entity
     
     logger.info("Starting full embedding regeneration")
     
-    # Get all entity IDs
-    entity_ids = list(Entity.objects.values_list('id', flat=True))
+    # Stream entity IDs (server-side cursor on PostgreSQL) instead of loading them all
+    entity_ids = Entity.objects.values_list('id', flat=True).iterator(chunk_size=5000)
     
-    logger.info(f"Found {len(entity_ids)} entities to process")
+    result = _queue_embedding_batches(entity_ids, force=True)
     
-    # Use batch processing
-    result = generate_embeddings_batch(entity_ids)
-    
-    logger.info(f"Full embedding regeneration complete: {result}")
+    logger.info(f"Queued full embedding regeneration: {result}")
     
     return result
 
@@ -155,33 +283,30 @@ def update_stale_embeddings(self, hours: int = 24):
         hours: Consider embeddings stale if entity was updated more than this many hours after embedding
         
     Returns:
-        dict: Summary of update results
+        dict: Summary of the queued embedding batches
     """
     from api.models import Entity
     from datetime import timedelta
+    from django.db.models import F, Q
     
     logger.info(f"Checking for stale embeddings (older than {hours} hours)")
     
-    # Find entities where:
+    # Find entities updated since the cutoff where:
     # 1. Embedding exists but is older than the entity's updated_at
     # 2. Or embedding doesn't exist at all
     cutoff_time = timezone.now() - timedelta(hours=hours)
     
+    # One range scan on entity_stale_idx (updated_at, embedding_updated_at)
     stale_entities = Entity.objects.filter(
+        Q(embedding__isnull=True) | Q(embedding_updated_at__lt=F('updated_at')),
         updated_at__gt=cutoff_time
-    ).filter(
-        # Either no embedding or embedding is older than entity
-        embedding__isnull=True
-    ) | Entity.objects.filter(
-        updated_at__gt=cutoff_time,
-        embedding_updated_at__lt=timezone.now() - timedelta(hours=hours)
     )
     
-    entity_ids = list(stale_entities.values_list('id', flat=True))
+    entity_ids = stale_entities.values_list('id', flat=True).iterator(chunk_size=5000)
     
-    logger.info(f"Found {len(entity_ids)} entities with stale embeddings")
+    result = _queue_embedding_batches(entity_ids)
     
-    if not entity_ids:
+    if not result['total']:
         return {
             'total': 0,
             'success': 0,
@@ -189,10 +314,54 @@ def update_stale_embeddings(self, hours: int = 24):
             'message': 'No stale embeddings found'
         }
     
-    # Use batch processing
-    result = generate_embeddings_batch(entity_ids)
-    
-    logger.info(f"Stale embedding update complete: {result}")
+    logger.info(f"Queued stale embedding update: {result}")
     
     return result
 
+
+def _queue_embedding_batches(entity_ids, force=False):
+    """
+    Split entity IDs into generate_embeddings_batch tasks spread over the workers.
+    
+    Each task embeds its chunk with one model call, and the chunks run on all
+    worker processes instead of serially in this one. IDs are consumed lazily
+    and every chunk is published as soon as it is full, so an iterator keeps
+    memory bounded to one chunk; all messages go through one producer.
+    
+    Args:
+        entity_ids: Iterable of entity IDs to embed
+        force: Passed on to generate_embeddings_batch
+        
+    Returns:
+        dict: Summary of the queued batches
+    """
+    total = 0
+    batches = 0
+    with generate_embeddings_batch.app.producer_or_acquire() as producer:
+        for batch in _chunked(entity_ids, EMBEDDING_BATCH_SIZE):
+            generate_embeddings_batch.apply_async(
+                ([str(entity_id) for entity_id in batch],), {'force': force}, producer=producer
+            )
+            total += len(batch)
+            batches += 1
+    
+    return {
+        'status': 'queued',
+        'total': total,
+        'batches': batches
+    }
+
+
+def _chunked(iterable, size):
+    """Yield lists of up to size items, consuming the iterable lazily"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _parse_uuid(value):
+    """Return value as a UUID, or None if it is not a valid entity ID"""
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
@@ -1,6 +1,158 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from api.models import EMBEDDING_DIMENSION, EMBEDDING_MODEL_NAME, Entity, embedded_text_hash
 
 
 def test_nothing():
     """A dummy test"""
-    assert True
\ No newline at end of file
+    assert True
+
+
+class EmbeddingDirtyFlagTestCase(TestCase):
+    """Test cases for the needs_reembed flag maintained by the post_save handler"""
+
+    def setUp(self):
+        cache.clear()
+        self.note = Entity.objects.create(type='note', title='Note', content='Content')
+        Entity.objects.filter(pk=self.note.pk).update(needs_reembed=False)
+        self.note.refresh_from_db()
+
+    def test_new_note_is_flagged(self):
+        """New notes start out needing an embedding"""
+        note = Entity.objects.create(type='note', title='New', content='Text')
+        note.refresh_from_db()
+        self.assertTrue(note.needs_reembed)
+
+    def test_edit_flags_note(self):
+        """Saving a note marks its embedding as out of date"""
+        self.note.content = 'Changed'
+        self.note.save()
+
+        self.note.refresh_from_db()
+        self.assertTrue(self.note.needs_reembed)
+
+    def test_non_text_edit_does_not_flag(self):
+        """Moving a note or editing its metadata keeps the embedding"""
+        parent = Entity.objects.create(type='note', title='Parent', content='Text')
+        note = Entity.objects.get(pk=self.note.pk)
+        note.parent = parent
+        note.metadata = {'pinned': True}
+        note.save()
+
+        note.refresh_from_db()
+        self.assertFalse(note.needs_reembed)
+
+    def test_embedding_only_save_does_not_flag(self):
+        """Writing the embedding itself must not re-flag the note"""
+        self.note.embedding = b'\x00' * 16
+        self.note.embedding_updated_at = timezone.now()
+        self.note.save(update_fields=['embedding', 'embedding_updated_at', 'needs_reembed'])
+
+        self.note.refresh_from_db()
+        self.assertFalse(self.note.needs_reembed)
+
+    def test_reverted_edit_keeps_embedding(self):
+        """Restoring the text the embedding was built from clears the flag again"""
+        self._store_embedding()
+        note = Entity.objects.get(pk=self.note.pk)
+        note.content = 'Draft'
+        note.save()
+        note.content = 'Content'
+        note.save()
+
+        note.refresh_from_db()
+        self.assertFalse(note.needs_reembed)
+
+    def test_reverted_edit_with_outdated_embedding_stays_flagged(self):
+        """A reverted edit keeps the flag when the stored vector is from another model or malformed"""
+        for embedding_model, embedding in [('old-model', b'\x00' * EMBEDDING_DIMENSION * 4), (EMBEDDING_MODEL_NAME, b'\x00' * 16)]:
+            with self.subTest(embedding_model=embedding_model, size=len(embedding)):
+                self._store_embedding(embedding_model=embedding_model, embedding=embedding)
+                note = Entity.objects.get(pk=self.note.pk)
+                note.content = 'Draft'
+                note.save()
+                note.content = 'Content'
+                note.save()
+
+                note.refresh_from_db()
+                self.assertTrue(note.needs_reembed)
+
+    def _store_embedding(self, embedding_model=EMBEDDING_MODEL_NAME, embedding=b'\x00' * EMBEDDING_DIMENSION * 4):
+        """Store an embedding for self.note as if it was computed from its current text"""
+        Entity.objects.filter(pk=self.note.pk).update(
+            embedding=embedding,
+            embedding_model=embedding_model,
+            content_hash=embedded_text_hash('Note', 'Content'),
+            needs_reembed=False
+        )
+
+    def test_deferred_field_load_keeps_unsaved_edit(self):
+        """Loading a deferred field does not record unsaved edits to other fields as stored"""
+        note = Entity.objects.only('id', 'type', 'content').get(pk=self.note.pk)
+        note.content = 'Changed'
+        self.assertEqual(note.title, 'Note')
+        note.save()
+
+        note.refresh_from_db()
+        self.assertTrue(note.needs_reembed)
+
+    @override_settings(CELERY_BROKER_URL='memory://')
+    def test_one_reembed_task_per_transaction(self):
+        """Bulk edits in one transaction enqueue a single re-embed task on commit"""
+        with mock.patch('api.tasks.reembed_flagged_entities.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    for i in range(3):
+                        Entity.objects.create(type='note', title=f'Bulk {i}', content='Text')
+                    self.note.save()
+
+        delay.assert_called_once_with()
+
+    @override_settings(CELERY_BROKER_URL='memory://')
+    def test_broker_failure_does_not_fail_save(self):
+        """A failed enqueue is logged after commit instead of raising from save()"""
+        with mock.patch('api.tasks.reembed_flagged_entities.delay', side_effect=ConnectionError('broker down')):
+            with self.assertLogs(level='ERROR'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    note = Entity.objects.create(type='note', title='Queued', content='Text')
+
+        note.refresh_from_db()
+        self.assertTrue(note.needs_reembed)
+
+    def test_edit_during_embedding_stays_flagged(self):
+        """A note edited after its text was read for embedding is flagged again"""
+        from api.services.vector_service import VectorService
+
+        rows = [(self.note.id, 'Note', 'Old content')]  # read before the note was edited
+        with mock.patch('api.services.vector_service._load_model') as load_model:
+            load_model.return_value.encode.return_value = np.ones((1, 4), dtype=np.float32)
+            VectorService().index_note_rows(rows)
+
+        self.note.refresh_from_db()
+        self.assertTrue(self.note.needs_reembed)
+        self.assertEqual(bytes(self.note.content_hash), embedded_text_hash('Note', 'Old content'))
+
+    def test_index_notes_clears_note_without_text(self):
+        """index_notes clears the flag of notes with nothing to embed instead of re-reading them"""
+        note = Entity.objects.create(type='note', title=' ', content='')
+        Entity.objects.filter(pk=self.note.pk).update(needs_reembed=True)
+
+        from api.services.vector_service import VectorService
+
+        with mock.patch('api.services.vector_service._load_model') as load_model:
+            load_model.return_value.encode.return_value = np.ones((1, 4), dtype=np.float32)
+            with mock.patch('api.management.commands.index_notes.get_vector_service', return_value=VectorService()):
+                call_command('index_notes', stdout=StringIO())
+                output = StringIO()
+                call_command('index_notes', stdout=output)
+
+        note.refresh_from_db()
+        self.assertFalse(note.needs_reembed)
+        self.assertIsNone(note.embedding)
+        self.assertIn('No notes need indexing.', output.getvalue())
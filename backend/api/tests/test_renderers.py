@@ -0,0 +1,43 @@
+"""
+Tests for the orjson-backed DRF renderer.
+"""
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+import uuid
+
+from django.test import SimpleTestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from backend.renderers import ORJSONRenderer
+
+
+class ORJSONRendererTestCase(SimpleTestCase):
+    """ORJSONRenderer output matches DRF's JSONRenderer"""
+
+    def assertSameOutput(self, data):
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_serializer_data(self):
+        """Serializer return types, UUIDs and nested values"""
+        item = ReturnDict({
+            'id': uuid.uuid4(),
+            'title': 'Note \u00e9',
+            'children': [uuid.uuid4()],
+            'metadata': {'pinned': True, 'weight': 1.5, 'tags': None},
+        }, serializer=None)
+        self.assertSameOutput(ReturnList([item], serializer=None))
+
+    def test_datetime_and_decimal(self):
+        """UTC datetimes end in Z and Decimals fall back to DRF's encoder"""
+        self.assertSameOutput({
+            'at': datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+            'amount': Decimal('1.25'),
+        })
+
+    def test_line_terminators_escaped(self):
+        """U+2028/U+2029 are escaped like the stock renderer"""
+        self.assertSameOutput({'content': 'a\u2028b\u2029c'})
+
+    def test_none_renders_empty(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
@@ -1,5 +1,33 @@
 from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+from api.models import Entity, Tag
+from api.serializers import EntitySerializer, EntityListSerializer
 
 def test_nothing():
     """A dummy test"""
     assert True
+
+
+class EntityListSerializerTestCase(TestCase):
+    """Test cases for the values()-based entity list serializer"""
+
+    def setUp(self):
+        self.parent = Entity.objects.create(type='note', title='Parent', content='Root', metadata={'pinned': True})
+        self.child = Entity.objects.create(type='media', title='Child', content='{}', parent=self.parent)
+        tag = Tag.objects.create(name='tag1')
+        self.parent.tags.add(tag)
+
+    def test_matches_entity_serializer(self):
+        """List output is identical to EntitySerializer(many=True)"""
+        queryset = Entity.objects.all()
+        renderer = JSONRenderer()
+
+        expected = renderer.render(EntitySerializer(queryset, many=True).data)
+        actual = renderer.render(EntityListSerializer(queryset).data)
+
+        self.assertEqual(actual, expected)
+
+    def test_constant_query_count(self):
+        """Rows, children and tags are fetched with one query each"""
+        with self.assertNumQueries(3):
+            EntityListSerializer(Entity.objects.all()).data
@@ -126,6 +126,26 @@ class SyncPullTestCase(TestCase):
         entity1_data = next(e for e in entities if e['id'] == str(self.entity1.id))
         self.assertIn(str(tag.id), entity1_data['tags'])
 
+    def test_sync_pull_query_count(self):
+        """Parents and tags do not add queries per entity"""
+        tag = Tag.objects.create(name='test-tag')
+        for entity in (self.entity1, self.entity2, self.entity3):
+            entity.tags.add(tag)
+        self.entity2.parent = self.entity1
+        self.entity2.save()
+        self.entity3.parent = self.entity1
+        self.entity3.save()
+
+        # Entity upserts, their tags, entity deletes, tag upserts, tag deletes
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('sync-pull'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        entities = response.data['changes']['entities']['upserts']
+        self.assertEqual(len(entities), 3)
+        for entity_data in entities:
+            self.assertEqual(entity_data['tags'], [str(tag.id)])
+
     def test_sync_pull_cursor_format(self):
         """Test that returned cursor is in ISO format"""
         response = self.client.get(reverse('sync-pull'))
@@ -0,0 +1,184 @@
+import uuid
+from unittest import mock
+import numpy as np
+from django.core.cache import cache
+from django.test import TestCase
+from api.models import EMBEDDING_DIMENSION, Entity, embedded_text_hash
+from api.services.vector_service import VectorService
+from api.tasks import generate_embedding_for_entity, generate_embeddings_batch, regenerate_all_embeddings
+
+
+class EmbeddingTaskTestCase(TestCase):
+    """Base test case with the sentence transformer replaced by a stub model"""
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('api.services.vector_service._load_model')
+        self.model = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.model.encode.side_effect = lambda texts, **kwargs: np.full(
+            (len(texts), EMBEDDING_DIMENSION), EMBEDDING_DIMENSION ** -0.5, dtype=np.float32
+        )
+
+        patcher = mock.patch('api.services.vector_service.get_vector_service', return_value=VectorService())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class GenerateEmbeddingsBatchTestCase(EmbeddingTaskTestCase):
+    """Test cases for the per-entity results of generate_embeddings_batch"""
+
+    def setUp(self):
+        super().setUp()
+        self.notes = [
+            Entity.objects.create(type='note', title=f'Note {i}', content='Text') for i in range(2)
+        ]
+        self.ids = [str(note.id) for note in self.notes]
+
+    def test_success(self):
+        """Every note is embedded with one model call"""
+        result = generate_embeddings_batch.run(self.ids)
+
+        self.assertEqual(result, {'total': 2, 'success': 2, 'skipped': 0, 'failed': 0, 'errors': []})
+        self.assertEqual(self.model.encode.call_count, 1)
+        for note in Entity.objects.filter(id__in=self.ids):
+            self.assertEqual(len(note.embedding), EMBEDDING_DIMENSION * 4)
+            self.assertFalse(note.needs_reembed)
+
+    def test_unchanged_text_skipped(self):
+        """Notes whose embedding matches their text are not sent to the model again"""
+        generate_embeddings_batch.run(self.ids)
+        self.model.encode.reset_mock()
+        cache.clear()
+
+        result = generate_embeddings_batch.run(self.ids)
+
+        self.assertEqual((result['success'], result['skipped'], result['failed']), (0, 2, 0))
+        self.model.encode.assert_not_called()
+
+    def test_outdated_embedding_not_skipped(self):
+        """Embeddings from another model or with the wrong size are replaced even if the text is unchanged"""
+        Entity.objects.filter(id=self.ids[0]).update(
+            embedding=b'\x00' * 16, embedding_model='all-MiniLM-L6-v2',
+            content_hash=embedded_text_hash('Note 0', 'Text'), needs_reembed=False
+        )
+        Entity.objects.filter(id=self.ids[1]).update(
+            embedding=b'\x00' * EMBEDDING_DIMENSION * 4, embedding_model='old-model',
+            content_hash=embedded_text_hash('Note 1', 'Text'), needs_reembed=False
+        )
+
+        result = generate_embeddings_batch.run(self.ids)
+
+        self.assertEqual((result['success'], result['skipped']), (2, 0))
+        for note in Entity.objects.filter(id__in=self.ids):
+            self.assertEqual(note.embedding_model, 'all-MiniLM-L6-v2')
+            self.assertNotEqual(bytes(note.embedding), b'\x00' * EMBEDDING_DIMENSION * 4)
+
+    def test_force(self):
+        """force re-encodes notes whose embedding is current"""
+        generate_embeddings_batch.run(self.ids)
+        self.model.encode.reset_mock()
+        cache.clear()
+
+        result = generate_embeddings_batch.run(self.ids, force=True)
+
+        self.assertEqual((result['success'], result['skipped']), (2, 0))
+        self.assertEqual(self.model.encode.call_count, 1)
+
+    def test_no_content(self):
+        """Notes without text are reported as failed"""
+        empty = Entity.objects.create(type='note', title=' ', content='')
+
+        result = generate_embeddings_batch.run(self.ids + [str(empty.id)])
+
+        self.assertEqual((result['success'], result['failed']), (2, 1))
+        self.assertEqual(result['errors'], [{'entity_id': str(empty.id), 'error': 'No content to embed'}])
+
+    def test_entity_not_found(self):
+        """Unknown and malformed IDs are reported per entity without failing the batch"""
+        missing = str(uuid.uuid4())
+
+        result = generate_embeddings_batch.run(self.ids + [missing, 'not-a-uuid'])
+
+        self.assertEqual((result['success'], result['failed']), (2, 2))
+        self.assertEqual(result['errors'], [
+            {'entity_id': missing, 'error': 'Entity not found'},
+            {'entity_id': 'not-a-uuid', 'error': 'Entity not found'},
+        ])
+
+    def test_model_failure(self):
+        """A model error fails the notes that needed embedding and is reported for each"""
+        self.model.encode.side_effect = RuntimeError('model exploded')
+
+        result = generate_embeddings_batch.run(self.ids)
+
+        self.assertEqual((result['success'], result['failed']), (0, 2))
+        self.assertEqual({error['error'] for error in result['errors']}, {'model exploded'})
+        self.assertTrue(all(note.needs_reembed for note in Entity.objects.filter(id__in=self.ids)))
+
+
+class GenerateEmbeddingForEntityTestCase(EmbeddingTaskTestCase):
+    """Test cases for the skip check of generate_embedding_for_entity"""
+
+    def setUp(self):
+        super().setUp()
+        self.note = Entity.objects.create(type='note', title='Note', content='Text')
+        self.entity_id = str(self.note.id)
+
+    def test_current_embedding_skipped(self):
+        """A second run for unchanged text does not call the model"""
+        self.assertEqual(generate_embedding_for_entity.run(self.entity_id)['status'], 'success')
+        self.model.encode.reset_mock()
+        cache.clear()
+
+        self.assertEqual(generate_embedding_for_entity.run(self.entity_id)['status'], 'skipped')
+        self.model.encode.assert_not_called()
+
+    def test_outdated_embedding_not_skipped(self):
+        """A malformed embedding from another model is replaced even if the text is unchanged"""
+        Entity.objects.filter(id=self.entity_id).update(
+            embedding=b'\x00' * 16, embedding_model='old-model',
+            content_hash=embedded_text_hash('Note', 'Text'), needs_reembed=False
+        )
+
+        result = generate_embedding_for_entity.run(self.entity_id)
+
+        self.assertEqual(result['status'], 'success')
+        self.note.refresh_from_db()
+        self.assertEqual(len(self.note.embedding), EMBEDDING_DIMENSION * 4)
+        self.assertEqual(self.note.embedding_model, 'all-MiniLM-L6-v2')
+
+    def test_force(self):
+        """force re-encodes a note whose embedding is current"""
+        generate_embedding_for_entity.run(self.entity_id)
+        self.model.encode.reset_mock()
+        cache.clear()
+
+        result = generate_embedding_for_entity.run(self.entity_id, force=True)
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(self.model.encode.call_count, 1)
+
+
+class QueueEmbeddingBatchesTestCase(TestCase):
+    """Test cases for fanning IDs out into generate_embeddings_batch tasks"""
+
+    def test_ids_published_in_chunks_over_one_producer(self):
+        """IDs are split into EMBEDDING_BATCH_SIZE chunks, all sent through the same producer"""
+        ids = {str(Entity.objects.create(type='note', title=f'Note {i}', content='Text').id) for i in range(5)}
+        app = generate_embeddings_batch.app
+
+        with mock.patch('api.tasks.EMBEDDING_BATCH_SIZE', 2), \
+                mock.patch.object(app, 'producer_or_acquire') as producer_or_acquire, \
+                mock.patch.object(generate_embeddings_batch, 'apply_async') as apply_async:
+            result = regenerate_all_embeddings.run()
+
+        self.assertEqual(result, {'status': 'queued', 'total': 5, 'batches': 3})
+        producer = producer_or_acquire.return_value.__enter__.return_value
+        batches = [call.args[0][0] for call in apply_async.call_args_list]
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual({entity_id for batch in batches for entity_id in batch}, ids)
+        for call in apply_async.call_args_list:
+            self.assertIs(call.kwargs['producer'], producer)
+            # Regenerating everything re-encodes current embeddings too
+            self.assertEqual(call.args[1], {'force': True})
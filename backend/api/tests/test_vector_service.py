@@ -0,0 +1,134 @@
+from unittest import mock
+import numpy as np
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from api.models import Entity
+from api.services.vector_service import VectorService, encode_embedding
+
+
+def unit(*values):
+    """Unit-length float32 vector, like the embeddings the model produces"""
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class VectorServiceTestCase(TestCase):
+    """Base test case with the sentence transformer replaced by fixed vectors per text"""
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('api.services.vector_service._load_model')
+        model = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+        self.vectors = {}
+        model.encode.side_effect = lambda texts, **kwargs: np.stack([self.vectors[text] for text in texts])
+        self.service = VectorService()
+
+    def create_note(self, title, vector, content=''):
+        note = Entity.objects.create(type='note', title=title, content=content)
+        self.store_embedding(note, vector)
+        return note
+
+    def store_embedding(self, note, embedding):
+        """Write an embedding directly, as a Celery worker would"""
+        if not isinstance(embedding, bytes):
+            embedding = encode_embedding(embedding)
+        Entity.objects.filter(pk=note.pk).update(
+            embedding=embedding,
+            embedding_updated_at=timezone.now()
+        )
+
+
+class FindSimilarNotesTestCase(VectorServiceTestCase):
+    """Test cases for the cached-matrix similarity search"""
+
+    def setUp(self):
+        super().setUp()
+        self.vectors['query'] = unit(1, 0, 0, 0)
+        self.closest = self.create_note('Closest', unit(1, 0.1, 0, 0))
+        self.close = self.create_note('Close', unit(1, 1, 0, 0))
+        self.far = self.create_note('Far', unit(1, 3, 0, 0))
+        self.unrelated = self.create_note('Unrelated', unit(0, 1, 0, 0))
+
+    def test_results_ranked_by_similarity(self):
+        """Notes come back most similar first, cut off at the limit"""
+        results = self.service.find_similar_notes('query', limit=3, threshold=0.0)
+        self.assertEqual(results, [self.closest, self.close, self.far])
+
+        results = self.service.find_similar_notes('query', limit=2, threshold=0.0)
+        self.assertEqual(results, [self.closest, self.close])
+
+    def test_threshold(self):
+        """Notes below the similarity threshold are left out"""
+        results = self.service.find_similar_notes('query', limit=10, threshold=0.9)
+        self.assertEqual(results, [self.closest])
+
+    def test_exclude_ids(self):
+        """Excluded notes are skipped and the next best take their place"""
+        results = self.service.find_similar_notes(
+            'query', limit=2, threshold=0.0, exclude_ids=[str(self.closest.id)]
+        )
+        self.assertEqual(results, [self.close, self.far])
+
+    def test_index_reused_until_embeddings_change(self):
+        """Repeated searches only run the signature query and the result lookup"""
+        self.service.find_similar_notes('query', limit=3, threshold=0.0)
+
+        with self.assertNumQueries(2):
+            self.service.find_similar_notes('query', limit=3, threshold=0.0)
+
+    def test_index_rebuilt_after_external_write(self):
+        """Embeddings written by another process are picked up by the next search"""
+        self.service.find_similar_notes('query', limit=3, threshold=0.0)
+
+        # Same note count, newer embedding: only the timestamp in the signature changes
+        self.store_embedding(self.unrelated, unit(1, 0, 0, 0))
+        results = self.service.find_similar_notes('query', limit=1, threshold=0.0)
+        self.assertEqual(results, [self.unrelated])
+
+        newest = self.create_note('Newest', unit(1, 0, 0, 0.01))
+        results = self.service.find_similar_notes('query', limit=2, threshold=0.0)
+        self.assertEqual(results, [self.unrelated, newest])
+
+    def test_wrong_size_embedding_skipped(self):
+        """Embeddings that do not match the query dimension are left out of the index"""
+        broken = self.create_note('Broken', b'\x00' * 8)
+
+        results = self.service.find_similar_notes('query', limit=10, threshold=0.0)
+        self.assertNotIn(broken, results)
+        self.assertEqual(results[0], self.closest)
+
+
+class FindRelevantContextTestCase(VectorServiceTestCase):
+    """Test cases for combining conversation and current-note searches"""
+
+    def setUp(self):
+        super().setUp()
+        self.a = self.create_note('A', unit(1, 0, 0, 0))
+        self.b = self.create_note('B', unit(0, 1, 0, 0))
+        self.c = self.create_note('C', unit(0, 0, 1, 0))
+        self.current = self.create_note('Current', unit(0, 0, 0, 1), content='Body')
+
+        self.vectors['hello'] = unit(1, 0, 0, 0)
+        # Matches c best, then a (already found by the conversation), then b
+        self.vectors['Current\nBody'] = unit(0.5, 0.45, 0.8, 1)
+
+    def test_conversation_results_first_without_duplicates(self):
+        """Conversation matches come first, then current-note matches not already included"""
+        results = self.service.find_relevant_context(['hello'], current_note_id=str(self.current.id))
+        self.assertEqual(results, [self.a, self.c, self.b])
+
+    def test_max_notes(self):
+        """The combined result is capped at max_notes"""
+        results = self.service.find_relevant_context(
+            ['hello'], current_note_id=str(self.current.id), max_notes=2
+        )
+        self.assertEqual(results, [self.a, self.c])
+
+    def test_current_note_excluded(self):
+        """The open note is never returned as its own context"""
+        results = self.service.find_relevant_context([], current_note_id=str(self.current.id))
+        self.assertNotIn(self.current, results)
+        self.assertEqual(results, [self.c, self.a, self.b])
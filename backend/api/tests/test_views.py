@@ -2,7 +2,7 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from django.core.files.uploadedfile import SimpleUploadedFile
-from api.models import Entity
+from api.models import Entity, Tag
 import json
 import base64
 
@@ -168,4 +168,39 @@ class MediaEntityTestCase(APITestCase):
 
 def test_nothing():
     """A dummy test"""
-    assert True
\ No newline at end of file
+    assert True
+
+
+class TagListTestCase(APITestCase):
+    """Test cases for the tag list endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        parent = Tag.objects.create(name='parent')
+        for i in range(3):
+            child = Tag.objects.create(name=f'child{i}', parent=parent)
+            entity = Entity.objects.create(type='note', title=f'Note {i}', content='Text')
+            entity.tags.add(parent, child)
+
+    def test_counts_without_per_tag_queries(self):
+        """Children and entity counts come from one annotated query"""
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('tag-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        counts = {tag['name']: (tag['children_count'], tag['entities_count']) for tag in response.data}
+        self.assertEqual(counts['parent'], (3, 3))
+        self.assertEqual(counts['child0'], (0, 1))
+
+    def test_counts_with_several_children_and_entities(self):
+        """Children and entities are counted independently, not as their cross product"""
+        root = Tag.objects.create(name='root')
+        for i in range(2):
+            Tag.objects.create(name=f'branch{i}', parent=root)
+        for i in range(5):
+            Entity.objects.create(type='note', title=f'Tagged {i}', content='Text').tags.add(root)
+
+        response = self.client.get(reverse('tag-detail', args=[root.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['children_count'], response.data['entities_count']), (2, 5))
@@ -1,5 +1,5 @@
-from .models import Entity, Theme, Tag
-from .serializers import EntitySerializer, ThemeSerializer, TagSerializer
+from .models import Entity, EntityTag, Theme, Tag
+from .serializers import EntitySerializer, EntityListSerializer, ThemeSerializer, TagSerializer
 from .serializers import SyncEntitySerializer, SyncTagSerializer
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view
@@ -8,7 +8,9 @@ from rest_framework.views import APIView
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 from django.shortcuts import get_object_or_404
-from .services.vector_service import VectorService
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery, prefetch_related_objects
+from django.db.models.functions import Coalesce
+from .services.vector_service import decode_embedding, get_vector_service
 from .tasks import (
     generate_embedding_for_entity,
     generate_embeddings_batch,
@@ -17,13 +19,45 @@ from .tasks import (
 )
 import logging
 import base64
-import json
 import mimetypes
+import orjson
 from django.core.files.uploadedfile import InMemoryUploadedFile
 
 logger = logging.getLogger(__name__)
 
 
+def _child_ids_prefetch():
+    """Prefetch the child ids EntitySerializer renders for `children` in one query"""
+    return Prefetch('children', queryset=Entity.objects.only('id', 'parent'))
+
+
+def _tag_ids_prefetch():
+    """Prefetch the tag ids EntitySerializer renders for `tags` in one query"""
+    return Prefetch('tags', queryset=Tag.objects.only('id'))
+
+
+def _count_per_tag(queryset, tag_field):
+    """Correlated COUNT of the queryset rows whose tag_field is the outer tag"""
+    counts = (
+        queryset.filter(**{tag_field: OuterRef('pk')})
+        .order_by()
+        .values(tag_field)
+        .annotate(count=Count('*'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def _tags_with_counts(queryset):
+    """Annotate the counts TagSerializer renders, instead of two COUNT queries per tag"""
+    # One subquery per relation: joining children and entities together would
+    # multiply them into (children x entities) rows per tag before counting
+    return queryset.annotate(
+        children_count=_count_per_tag(Tag.objects.all(), 'parent'),
+        entities_count=_count_per_tag(EntityTag.objects.all(), 'tag'),
+    )
+
+
 @api_view(['GET'])
 def health_check(request):
     """
@@ -44,23 +78,33 @@ class EntityViewSet(viewsets.ModelViewSet):
     serializer_class = EntitySerializer
     queryset = Entity.objects.all()
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'download_file':
+            # Only the file payload is needed; skip the embedding and metadata columns
+            queryset = queryset.only('id', 'type', 'content')
+        elif self.action in ('retrieve', 'update', 'partial_update'):
+            queryset = queryset.prefetch_related(_child_ids_prefetch(), _tag_ids_prefetch())
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """List entities via the values() fast path; writes and detail views use EntitySerializer"""
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(EntityListSerializer(queryset).data)
+
     @action(detail=False, methods=['post'])
     def get_relevant_context(self, request):
         """Get relevant notes for AI context - follows your @action pattern"""
         try:
-            # Log incoming request
-            logger.info("=== GET_RELEVANT_CONTEXT REQUEST ===")
-            logger.info(f"Request data: {request.data}")
-
-            from .services.vector_service import VectorService
-            vector_service = VectorService()
+            vector_service = get_vector_service()
             conversation = request.data.get('conversation', [])
             current_note_id = request.data.get('current_note_id')
             max_notes = request.data.get('max_notes', 10)
 
-            logger.info(f"Conversation history: {conversation}")
-            logger.info(f"Current note ID: {current_note_id}")
-            logger.info(f"Max notes requested: {max_notes}")
+            logger.debug(
+                "Relevant context request: %d messages, current_note_id=%s, max_notes=%s",
+                len(conversation), current_note_id, max_notes
+            )
 
             relevant_notes = vector_service.find_relevant_context(
                 conversation_history=conversation,
@@ -68,11 +112,11 @@ class EntityViewSet(viewsets.ModelViewSet):
                 max_notes=max_notes
             )
 
-            logger.info(f"Found {len(relevant_notes)} relevant notes:")
-            for i, note in enumerate(relevant_notes):
-                logger.info(f"  {i+1}. {note.title} (ID: {note.id})")
-                logger.info(f"     Content preview: {note.content[:100]}...")
+            if logger.isEnabledFor(logging.DEBUG):
+                for i, note in enumerate(relevant_notes, 1):
+                    logger.debug("  %d. %s (ID: %s)", i, note.title, note.id)
 
+            prefetch_related_objects(relevant_notes, _child_ids_prefetch(), _tag_ids_prefetch())
             serializer = self.get_serializer(relevant_notes, many=True)
             response_data = {
                 'success': True,
@@ -80,16 +124,12 @@ class EntityViewSet(viewsets.ModelViewSet):
                 'count': len(relevant_notes)
             }
 
-            logger.info(f"Returning {len(relevant_notes)} notes to frontend")
-            logger.info("=== GET_RELEVANT_CONTEXT RESPONSE ===")
+            logger.info("Returning %d relevant notes", len(relevant_notes))
 
             return Response(response_data)
 
         except Exception as e:
-            logger.error(f"Failed to get relevant context: {e}")
-            logger.error("=== GET_RELEVANT_CONTEXT ERROR ===")
-            import traceback
-            logger.error(f"Full traceback: {traceback.format_exc()}")
+            logger.exception("Failed to get relevant context: %s", e)
             return Response({
                 'success': False,
                 'error': str(e)
@@ -99,8 +139,7 @@ class EntityViewSet(viewsets.ModelViewSet):
     def vector_stats(self, request):
         """Get vector index statistics"""
         try:
-            from .services.vector_service import VectorService
-            vector_service = VectorService()
+            vector_service = get_vector_service()
             stats = vector_service.get_stats()
             return Response({
                 'success': True,
@@ -121,8 +160,7 @@ class EntityViewSet(viewsets.ModelViewSet):
             return Response([])
 
         entities = Entity.objects.filter(tags__id__in=tag_ids).distinct()
-        serializer = self.get_serializer(entities, many=True)
-        return Response(serializer.data)
+        return Response(EntityListSerializer(entities).data)
 
     @action(detail=True, methods=['post'])
     def add_tags(self, request, pk=None):
@@ -160,8 +198,6 @@ class EntityViewSet(viewsets.ModelViewSet):
     def upload_file(self, request):
         """Upload a file and create a media entity"""
         try:
-            logger.info("=== FILE UPLOAD REQUEST ===")
-
             # Get the uploaded file
             uploaded_file = request.FILES.get('file')
             if not uploaded_file:
@@ -174,10 +210,10 @@ class EntityViewSet(viewsets.ModelViewSet):
             title = request.data.get('title', uploaded_file.name)
             parent_id = request.data.get('parent')
 
-            logger.info(f"Uploading file: {uploaded_file.name}")
-            logger.info(f"File size: {uploaded_file.size} bytes")
-            logger.info(f"Content type: {uploaded_file.content_type}")
-            logger.info(f"Title: {title}")
+            logger.debug(
+                "Uploading file %s (%d bytes, %s) as %r",
+                uploaded_file.name, uploaded_file.size, uploaded_file.content_type, title
+            )
 
             # Validate file size (10MB limit)
             max_size = 10 * 1024 * 1024  # 10MB
@@ -209,15 +245,14 @@ class EntityViewSet(viewsets.ModelViewSet):
             entity_data = {
                 'type': 'media',
                 'title': title,
-                'content': json.dumps(content_structure),
+                'content': orjson.dumps(content_structure).decode(),
                 'parent': parent_id
             }
 
             serializer = self.get_serializer(data=entity_data)
             if serializer.is_valid():
                 entity = serializer.save()
-                logger.info(f"Created media entity: {entity.id}")
-                logger.info("=== FILE UPLOAD SUCCESS ===")
+                logger.info("Created media entity %s", entity.id)
 
                 return Response({
                     'success': True,
@@ -232,10 +267,7 @@ class EntityViewSet(viewsets.ModelViewSet):
                 }, status=status.HTTP_400_BAD_REQUEST)
 
         except Exception as e:
-            logger.error(f"File upload failed: {e}")
-            logger.error("=== FILE UPLOAD ERROR ===")
-            import traceback
-            logger.error(f"Full traceback: {traceback.format_exc()}")
+            logger.exception("File upload failed: %s", e)
             return Response({
                 'success': False,
                 'error': str(e)
@@ -255,7 +287,7 @@ class EntityViewSet(viewsets.ModelViewSet):
 
             # Parse the structured content
             try:
-                content_data = json.loads(entity.content)
+                content_data = orjson.loads(entity.content)
                 file_data = base64.b64decode(content_data['data'])
                 mime_type = content_data.get('mimeType', 'application/octet-stream')
                 filename = content_data.get('filename', f'file_{entity.id}')
@@ -265,7 +297,7 @@ class EntityViewSet(viewsets.ModelViewSet):
                 response['Content-Disposition'] = f'attachment; filename="{filename}"'
                 return response
 
-            except (json.JSONDecodeError, KeyError) as e:
+            except (orjson.JSONDecodeError, KeyError) as e:
                 return Response({
                     'success': False,
                     'error': 'Invalid media entity content structure'
@@ -283,10 +315,17 @@ class TagViewSet(viewsets.ModelViewSet):
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'entities':
+            # Only the tag itself is needed to look up its entities
+            return queryset
+        return _tags_with_counts(queryset)
+
     @action(detail=False, methods=['get'])
     def hierarchy(self, request):
         """Get tags in hierarchical structure"""
-        root_tags = Tag.objects.filter(parent=None).prefetch_related('children')
+        root_tags = _tags_with_counts(Tag.objects.filter(parent=None))
         serializer = TagSerializer(root_tags, many=True)
         return Response(serializer.data)
 
@@ -294,9 +333,7 @@ class TagViewSet(viewsets.ModelViewSet):
     def entities(self, request, pk=None):
         """Get entities with this tag"""
         tag = self.get_object()
-        entities = tag.entities.all()
-        serializer = EntitySerializer(entities, many=True)
-        return Response(serializer.data)
+        return Response(EntityListSerializer(tag.entities.all()).data)
 
 
 class ThemeViewSet(viewsets.ModelViewSet):
@@ -346,7 +383,10 @@ class SyncPullView(APIView):
             since_dt = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
 
         # Entities
-        entity_upserts_qs = Entity.objects.filter(server_updated_at__gt=since_dt, deleted=False)
+        # Tag ids come from one prefetch query; the embedding blob is never sent to clients
+        entity_upserts_qs = Entity.objects.filter(
+            server_updated_at__gt=since_dt, deleted=False
+        ).defer('embedding').prefetch_related(_tag_ids_prefetch())
         entity_deletes_qs = Entity.objects.filter(server_updated_at__gt=since_dt, deleted=True)
         entities_upserts = SyncEntitySerializer(entity_upserts_qs, many=True).data
         entities_deletes = [str(eid) for eid in entity_deletes_qs.values_list('id', flat=True)]
@@ -398,10 +438,10 @@ class SyncPushView(APIView):
             filtered_data = {k: v for k, v in data.items() if k not in skip_fields}
 
             try:
-                logger.info(f"Sync push: processing {op} for {model_cls.__name__} {obj_id}, client_rev={client_rev}")
+                logger.debug("Sync push: processing %s for %s %s, client_rev=%s", op, model_cls.__name__, obj_id, client_rev)
                 obj = model_cls.objects.select_for_update().get(id=obj_id)
                 server_rev = obj.rev
-                logger.info(f"Sync push: server has {model_cls.__name__} {obj_id} with rev={server_rev}")
+                logger.debug("Sync push: server has %s %s with rev=%s", model_cls.__name__, obj_id, server_rev)
 
                 if op == 'delete':
                     # Client sends client_rev = expected_new_rev (server_rev + 1)
@@ -410,7 +450,7 @@ class SyncPushView(APIView):
                         obj.deleted_at = timezone.now()
                         obj.rev = server_rev + 1
                         obj.save()
-                        logger.info(f"Sync push: applied delete to {model_cls.__name__} {obj_id}, new_rev={obj.rev}")
+                        logger.debug("Sync push: applied delete to %s %s, new_rev=%s", model_cls.__name__, obj_id, obj.rev)
                         return {"id": str(obj.id), "status": "applied", "rev": obj.rev, "server_updated_at": obj.server_updated_at.isoformat()}
                     else:
                         logger.warning(f"Sync push: delete conflict for {model_cls.__name__} {obj_id}, client_rev={client_rev}, expected={server_rev + 1}")
@@ -438,17 +478,17 @@ class SyncPushView(APIView):
                             if isinstance(tag_ids, list):
                                 obj.tags.set(tag_ids)
 
-                        logger.info(f"Sync push: applied update to {model_cls.__name__} {obj_id}, new_rev={obj.rev}")
+                        logger.debug("Sync push: applied update to %s %s, new_rev=%s", model_cls.__name__, obj_id, obj.rev)
                         return {"id": str(obj.id), "status": "applied", "rev": obj.rev, "server_updated_at": obj.server_updated_at.isoformat()}
                     else:
                         logger.warning(f"Sync push: update conflict for {model_cls.__name__} {obj_id}, client_rev={client_rev}, expected={server_rev + 1}")
                         return {"id": str(obj.id), "status": "conflict", "server": serialize(obj)}
             except model_cls.DoesNotExist:
                 if op == 'delete':
-                    logger.info(f"Sync push: delete for non-existent {model_cls.__name__} {obj_id}")
+                    logger.debug("Sync push: delete for non-existent %s %s", model_cls.__name__, obj_id)
                     return {"id": str(obj_id), "status": "applied", "rev": 0}
                 # Create new object with filtered data
-                logger.info(f"Sync push: creating new {model_cls.__name__} {obj_id}")
+                logger.debug("Sync push: creating new %s %s", model_cls.__name__, obj_id)
 
                 # Handle ForeignKey fields specially for Entity model
                 create_data = filtered_data.copy()
@@ -467,7 +507,7 @@ class SyncPushView(APIView):
                     if isinstance(tag_ids, list):
                         obj.tags.set(tag_ids)
 
-                logger.info(f"Sync push: created {model_cls.__name__} {obj_id}, rev={obj.rev}")
+                logger.debug("Sync push: created %s %s, rev=%s", model_cls.__name__, obj_id, obj.rev)
                 return {"id": str(obj.id), "status": "applied", "rev": obj.rev, "server_updated_at": obj.server_updated_at.isoformat()}
             except Exception as e:
                 logger.error(f"Sync push: error processing {model_cls.__name__} {obj_id}: {str(e)}", exc_info=True)
@@ -502,8 +542,8 @@ def generate_entity_embedding(request, entity_id):
     """
     entity = get_object_or_404(Entity, id=entity_id)
 
-    # Queue the task
-    task = generate_embedding_for_entity.delay(str(entity_id))
+    # Explicitly requested, so re-encode even if the stored embedding looks current
+    task = generate_embedding_for_entity.delay(str(entity_id), force=True)
 
     logger.info(f"Queued embedding generation for entity {entity_id}, task_id: {task.id}")
 
@@ -636,7 +676,7 @@ def embedding_status(request, entity_id):
     entity = get_object_or_404(Entity, id=entity_id)
 
     has_embedding = entity.embedding is not None
-    embedding_dimension = len(entity.embedding) if entity.embedding is not None else 0
+    embedding_dimension = len(decode_embedding(entity.embedding)) if entity.embedding is not None else 0
 
     # Check if embedding is stale (entity updated after embedding)
     is_stale = False
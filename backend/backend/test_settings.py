@@ -141,6 +141,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'backend.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     # Use JSON renderer only for testing (faster)
     'TEST_REQUEST_DEFAULT_FORMAT': 'json',
     # Disable throttling for testing
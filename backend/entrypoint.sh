@@ -1,2 +1,2 @@
 #!/bin/bash
-exec python -m uvicorn backend.asgi:application --host 0.0.0.0 --port $BACKEND_PORT
\ No newline at end of file
+exec python -m uvicorn backend.asgi:application --host 0.0.0.0 --port $BACKEND_PORT --loop uvloop
\ No newline at end of file
@@ -5,4 +5,4 @@ python manage.py migrate
 
 # Start the development server
 echo "Starting development server..."
-exec python -m uvicorn backend.asgi:application --host 0.0.0.0 --port $BACKEND_PORT --reload
\ No newline at end of file
+exec python -m uvicorn backend.asgi:application --host 0.0.0.0 --port $BACKEND_PORT --loop uvloop --reload
\ No newline at end of file